@@ -10,7 +10,8 @@ import os
 from threading import Thread
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
-from datetime import datetime
+import heapq
+from datetime import datetime, timedelta
 
 # ================== Logging ==================
 logging.basicConfig(
@@ -24,6 +25,8 @@ BOT_TOKEN = os.environ.get('BOT_TOKEN')
 ADMIN_ID = os.environ.get('ADMIN_ID')  # معرف الأدمن لاستقبال طلبات التسجيل
 PORT = int(os.environ.get('PORT', '10000'))
 WEBAPP_URL = os.environ.get('WEBAPP_URL', 'https://your-webapp-url.com')
+PENDING_EXPIRY_HOURS = int(os.environ.get('PENDING_EXPIRY_HOURS', '72'))  # مدة صلاحية طلبات التسجيل المعلقة
+PENDING_CHECK_INTERVAL = int(os.environ.get('PENDING_CHECK_INTERVAL', '3600'))  # بالثواني
 
 if not BOT_TOKEN:
     logger.error("❌ BOT_TOKEN غير موجود")
@@ -70,12 +73,16 @@ def is_user_approved(user_id):
 def add_pending_user(user_id, user_data):
     """إضافة مستخدم في انتظار الموافقة"""
     users = load_users()
+    registration_date = datetime.now()
     users[str(user_id)] = {
         **user_data,
         'approved': False,
-        'registration_date': datetime.now().isoformat()
+        'registration_date': registration_date.isoformat()
     }
-    return save_users(users)
+    if save_users(users):
+        heapq.heappush(pending_heap, (registration_date, str(user_id)))
+        return True
+    return False
 
 def approve_user(user_id):
     """الموافقة على مستخدم"""
@@ -101,6 +108,55 @@ def get_user_data(user_id):
     users = load_users()
     return users.get(str(user_id), None)
 
+# ================== انتهاء صلاحية الطلبات المعلقة ==================
+# كومة (min-heap) مرتبة حسب تاريخ التسجيل: (registration_date, user_id)
+# العناصر القديمة (بعد الموافقة أو الرفض) تُتجاهل عند سحبها
+pending_heap = []
+
+def build_pending_heap():
+    """بناء كومة الطلبات المعلقة من قاعدة البيانات (مرة واحدة عند التشغيل)"""
+    pending_heap.clear()
+    for user_str, data in load_users().items():
+        if data.get('approved', False):
+            continue
+        try:
+            registration_date = datetime.fromisoformat(data['registration_date'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        pending_heap.append((registration_date, user_str))
+    heapq.heapify(pending_heap)
+    logger.info(f"⏳ عدد الطلبات المعلقة: {len(pending_heap)}")
+
+def pop_expired_pending_users(max_age):
+    """حذف الطلبات المعلقة الأقدم من max_age وإرجاع بياناتها"""
+    cutoff = datetime.now() - max_age
+    candidates = []
+    while pending_heap and pending_heap[0][0] <= cutoff:
+        candidates.append(heapq.heappop(pending_heap))
+    
+    if not candidates:
+        return []
+    
+    users = load_users()
+    expired = []
+    for registration_date, user_str in candidates:
+        data = users.get(user_str)
+        # تجاهل من تمت الموافقة عليه أو رفضه أو أعاد التسجيل بتاريخ أحدث
+        if (not data or data.get('approved', False)
+                or data.get('registration_date') != registration_date.isoformat()):
+            continue
+        expired.append((int(user_str), users.pop(user_str)))
+    
+    if expired and not save_users(users):
+        # إعادة العناصر للكومة لإعادة المحاولة في الدورة القادمة
+        for user_id, data in expired:
+            heapq.heappush(
+                pending_heap,
+                (datetime.fromisoformat(data['registration_date']), str(user_id))
+            )
+        return []
+    return expired
+
 # ================== حالات المحادثة للتسجيل ==================
 FULL_NAME, FAMILY_HEAD, PHONE, WHATSAPP = range(4)
 
@@ -567,6 +623,26 @@ async def admin_decision(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await query.edit_message_text("❌ حدث خطأ في رفض الطلب")
 
 
+async def expire_pending_users(context: ContextTypes.DEFAULT_TYPE):
+    """مهمة دورية: إلغاء طلبات التسجيل المعلقة منتهية الصلاحية وإشعار أصحابها"""
+    expired = pop_expired_pending_users(timedelta(hours=PENDING_EXPIRY_HOURS))
+    
+    for user_id, user_data in expired:
+        try:
+            await context.bot.send_message(
+                chat_id=user_id,
+                text=f"⌛ *عذراً {user_data.get('full_name', '')}*\n\n"
+                     "انتهت صلاحية طلب التسجيل الخاص بك لعدم مراجعته في الوقت المحدد.\n\n"
+                     "📝 يمكنك التسجيل من جديد بإرسال /start",
+                parse_mode="Markdown"
+            )
+        except Exception as e:
+            logger.error(f"خطأ في إرسال إشعار انتهاء الصلاحية: {e}")
+    
+    if expired:
+        logger.info(f"⌛ تم إلغاء {len(expired)} طلب تسجيل منتهي الصلاحية")
+
+
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """أمر المساعدة"""
     await update.message.reply_text(
@@ -639,6 +715,17 @@ def main():
     # معالج الأخطاء
     application.add_error_handler(error_handler)
     
+    # مهمة انتهاء صلاحية الطلبات المعلقة
+    build_pending_heap()
+    if application.job_queue:
+        application.job_queue.run_repeating(
+            expire_pending_users,
+            interval=PENDING_CHECK_INTERVAL,
+            first=10
+        )
+    else:
+        logger.warning("⚠️ JobQueue غير متوفر - ثبّت python-telegram-bot[job-queue]")
+    
     # بدء البوت
     logger.info("✅ البوت جاهز للعمل")
     application.run_polling(